@@ -1,4 +1,19 @@
-from db import get_connection
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from db import get_connection, get_period_consumption
+
+STATEMENT_DIR = "statements"
+# Bei Layout-Änderungen erhöhen, damit alle Abrechnungen neu erzeugt werden.
+STATEMENT_TEMPLATE_VERSION = 2
 
 
 def export_pdf(path="report.pdf"):
@@ -83,3 +98,143 @@ def export_inventory_pdf(path="inventory.pdf"):
         ("VALIGN",     (0,0), (-1,-1),  "MIDDLE"),
     ]))
     doc.build([table])
+
+
+def format_cents(cents: int) -> str:
+    return f"{cents / 100:.2f} €".replace(".", ",")
+
+
+_statement_style = None
+
+
+def _init_statement_worker():
+    """Build the reportlab styles once per worker process."""
+    global _statement_style
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import TableStyle
+
+    styles = getSampleStyleSheet()
+    _statement_style = {
+        "title": styles["Title"],
+        "normal": styles["Normal"],
+        "table": TableStyle([
+            ("GRID",       (0,0), (-1,-1), 0.5, colors.black),
+            ("BACKGROUND", (0,0), (-1,0),   colors.lightgrey),
+            ("VALIGN",     (0,0), (-1,-1),  "MIDDLE"),
+            ("ALIGN",      (1,1), (-1,-1),  "RIGHT"),
+            ("FONTNAME",   (0,-1), (-1,-1), "Helvetica-Bold"),
+        ]),
+    }
+
+
+def _render_statement(job):
+    """Render one user statement; runs inside a worker process."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+    path, period, name, rows = job
+    total_qty = sum(q for _, q, _ in rows)
+    total_amount = sum(a for _, _, a in rows)
+    data = [("Produkt", "Anzahl", "Betrag")]
+    data += [(p, q, format_cents(a)) for p, q, a in rows]
+    data.append(("Summe", total_qty, format_cents(total_amount)))
+    table = Table(data, colWidths=[250, 80, 100])
+    table.setStyle(_statement_style["table"])
+    doc = SimpleDocTemplate(path, pagesize=A4)
+    doc.build([
+        Paragraph(f"Abrechnung {period}", _statement_style["title"]),
+        Paragraph(escape(name), _statement_style["normal"]),
+        Spacer(1, 12),
+        table,
+    ])
+    return path
+
+
+def _last_manifest(base_dir, period):
+    """Return the newest manifest of an earlier run for the same period."""
+    if not os.path.isdir(base_dir):
+        return None
+    for run in sorted(os.listdir(base_dir), reverse=True):
+        run_dir = os.path.join(base_dir, run, period)
+        path = os.path.join(run_dir, "manifest.json")
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            manifest["dir"] = run_dir
+            return manifest
+    return None
+
+
+def export_user_statements(period, base_dir=STATEMENT_DIR, workers=None):
+    """
+    Exportiert eine Abrechnung pro Nutzer für den Monat ``period`` (JJJJ-MM).
+
+    Die Daten aller Nutzer kommen aus einer einzigen Abfrage; die PDFs werden
+    in einem Prozess-Pool erzeugt. Nutzer, deren Daten sich seit dem letzten
+    Lauf nicht geändert haben (gleicher Inhalts-Hash), werden nicht neu
+    gerendert. Ausgabe nach ``base_dir/<Datum>/<Monat>/`` inkl.
+    ``manifest.json``; PDFs, die nicht mehr im Manifest stehen, werden dort
+    gelöscht.
+    """
+    rows = get_period_consumption(period)
+
+    out_dir = os.path.join(base_dir, date.today().isoformat(), period)
+    previous = _last_manifest(base_dir, period)
+    previous_users = {e["user_id"]: e for e in previous["users"]} if previous else {}
+    os.makedirs(out_dir, exist_ok=True)
+
+    entries, jobs = [], []
+    for user_id, group in groupby(rows, key=lambda r: (r[0], r[1])):
+        user_id, name = user_id
+        items = [(p, q, a) for _, _, p, q, a in group]
+        digest = hashlib.sha256(json.dumps(
+            [STATEMENT_TEMPLATE_VERSION, period, name, items]
+        ).encode("utf-8")).hexdigest()
+        safe_name = re.sub(r"[^\w-]+", "_", name)
+        filename = f"{period}_{user_id}_{safe_name}.pdf"
+        path = os.path.join(out_dir, filename)
+        entry = {
+            "user_id": user_id,
+            "name": name,
+            "file": filename,
+            "hash": digest,
+            "amount_cents": sum(a for _, _, a in items),
+        }
+        old = previous_users.get(user_id)
+        old_path = os.path.join(previous["dir"], old["file"]) if old else None
+        if old and old["hash"] == digest and os.path.isfile(old_path):
+            if os.path.abspath(old_path) != os.path.abspath(path):
+                shutil.copy2(old_path, path)
+            entry["status"] = "unverändert"
+        else:
+            entry["status"] = "neu"
+            jobs.append((path, period, name, items))
+        entries.append(entry)
+
+    if len(jobs) > 1 and workers != 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_statement_worker,
+        ) as pool:
+            list(pool.map(_render_statement, jobs))
+    elif jobs:
+        _init_statement_worker()
+        for job in jobs:
+            _render_statement(job)
+
+    listed = {e["file"] for e in entries}
+    for filename in os.listdir(out_dir):
+        if filename.endswith(".pdf") and filename not in listed:
+            os.remove(os.path.join(out_dir, filename))
+
+    manifest = {
+        "period": period,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "users": entries,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    manifest["dir"] = out_dir
+    return manifest
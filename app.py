@@ -2,12 +2,23 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import requests
 import webbrowser
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 from db import (
     init_db, get_user_count, authenticate, create_user,
     create_product, record_transaction, get_inventory, update_product_count,
-    update_pin, delete_user, delete_product, get_user_summary
+    update_pin, delete_user, delete_product, get_user_summary,
+    update_min_count, get_open_alert_count, get_restock_list,
+    set_product_price, get_current_prices, run_settlement, get_user_balance,
+    get_settlement_date,
+    get_consumption_series, get_top_consumers, get_top_products,
+    get_restock_forecast
 )
-from admin import export_pdf, export_users_pdf, export_inventory_pdf
+from admin import (
+    export_pdf, export_users_pdf, export_inventory_pdf, export_user_statements,
+    format_cents
+)
+from tracing import tracer_from_env
 
 def fetch_product_name_online(barcode: str) -> str:
     url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
@@ -18,6 +29,15 @@ def fetch_product_name_online(barcode: str) -> str:
         return data["product"]["product_name"]
     raise RuntimeError("Nicht in OpenFoodFacts gefunden")
 
+def parse_cents(text: str) -> int:
+    try:
+        value = Decimal(text.strip().replace(",", "."))
+        if not value.is_finite() or value != value.quantize(Decimal("0.01")):
+            raise ValueError("Ungültiger Preis")
+        return int(value * 100)
+    except (InvalidOperation, AttributeError):
+        raise ValueError("Ungültiger Preis")
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -166,6 +186,8 @@ class UserFrame(tk.Frame):
             text = "\n".join(f"{n}: {c}" for n, c in summary)
         else:
             text = "Keine Buchungen vorhanden."
+        balance = get_user_balance(self.master.user[0])
+        text += f"\n\nOffener Betrag diesen Monat: {format_cents(balance)}"
         self.summary_var.set(text)
         self.entry.focus()
         self._restart_timer()
@@ -178,18 +200,34 @@ class AdminFrame(tk.Frame):
             ("Neues Produkt", self._new_prod),
             ("Bestand anzeigen", self._show_inv),
             ("Bestand bearbeiten", self._edit_inv),
+            ("Mindestbestand setzen", self._edit_min),
+            ("Nachbestellen", self._show_restock),
+            ("Statistik", self._show_stats),
+            ("Preis setzen", self._set_price),
+            ("Preisliste", self._show_prices),
+            ("Monatsabrechnung", self._settle),
             ("User löschen", self._del_user),
             ("Produkt löschen", self._del_prod),
             ("PDF exportieren", self._export),
+            ("Einzelabrechnungen PDF", self._export_statements),
             ("Userliste PDF", self._export_users),
             ("Produktliste PDF", self._export_inv),
             ("PIN ändern", self._edit_pin),
             ("Logout", lambda: master._show_frame(LoginFrame))
         ]
+        self.buttons = {}
         for t,cmd in btns:
-            ttk.Button(self, text=t, command=cmd).pack(fill="x", pady=5, padx=20)
+            btn = ttk.Button(self, text=t, command=cmd)
+            btn.pack(fill="x", pady=5, padx=20)
+            self.buttons[t] = btn
+
+    def on_show(self):
+        self._update_restock_badge()
 
-    def on_show(self): pass
+    def _update_restock_badge(self):
+        n = get_open_alert_count()
+        text = f"Nachbestellen ({n})" if n else "Nachbestellen"
+        self.buttons["Nachbestellen"].config(text=text)
 
     def _new_user(self):
         from tkinter.simpledialog import askstring
@@ -216,12 +254,14 @@ class AdminFrame(tk.Frame):
         except Exception:
             name = askstring("Produkt", "Name manuell:", parent=root)
         cnt = askstring("Produkt", "Anfangsbestand (Zahl):", parent=root) or "0"
+        mc = askstring("Produkt", "Mindestbestand (Zahl):", parent=root) or "0"
         try:
             cnt = int(cnt)
-            create_product(bc,name,cnt)
+            create_product(bc,name,cnt,int(mc))
             messagebox.showinfo("OK", "Produkt angelegt", parent=root)
         except Exception as e:
             messagebox.showerror("Fehler", str(e), parent=root)
+        self._update_restock_badge()
 
     def _show_inv(self):
         inv = get_inventory()
@@ -242,6 +282,99 @@ class AdminFrame(tk.Frame):
             messagebox.showinfo("OK", "Bestand aktualisiert", parent=root)
         except Exception as e:
             messagebox.showerror("Fehler", str(e), parent=root)
+        self._update_restock_badge()
+
+    def _edit_min(self):
+        from tkinter.simpledialog import askstring
+        root = self.winfo_toplevel()
+        bc = askstring("Mindestbestand", "Barcode:", parent=root)
+        if not bc:
+            return
+        mc = askstring("Mindestbestand", "Neuer Mindestbestand:", parent=root)
+        try:
+            update_min_count(bc,int(mc))
+            messagebox.showinfo("OK", "Mindestbestand aktualisiert", parent=root)
+        except Exception as e:
+            messagebox.showerror("Fehler", str(e), parent=root)
+        self._update_restock_badge()
+
+    def _show_restock(self):
+        rows = get_restock_list()
+        text = "\n".join(
+            f"{n} ({b}) - Bestand: {c} / Minimum: {m}" for b, n, c, m, _ in rows
+        )
+        messagebox.showinfo("Nachbestellen", text or "Alles vorrätig", parent=self)
+        self._update_restock_badge()
+
+    def _show_stats(self):
+        parts = ["Letzte 24 Stunden:"]
+        parts += [f"  {b[11:]} Uhr: {q}" for b, q in get_consumption_series("hour", 1)]
+        parts.append("Letzte 7 Tage:")
+        parts += [f"  {b}: {q}" for b, q in get_consumption_series("day", 7)]
+        parts.append("Letzte 8 Wochen:")
+        parts += [f"  Woche ab {b}: {q}" for b, q in get_consumption_series("week", 56)]
+        parts.append("Top-Verbraucher (30 Tage):")
+        parts += [f"  {n}: {q}" for n, q in get_top_consumers()]
+        parts.append("Top-Produkte (30 Tage):")
+        parts += [f"  {n}: {q}" for n, q in get_top_products()]
+        parts.append("Reichweite (Verbrauch der letzten 14 Tage):")
+        parts += [
+            f"  {n}: {c} Stück, ca. {d:.0f} Tage" for _, n, c, _, d in get_restock_forecast()
+            if d is not None
+        ]
+        messagebox.showinfo("Statistik", "\n".join(parts), parent=self)
+
+    def _set_price(self):
+        from tkinter.simpledialog import askstring
+        root = self.winfo_toplevel()
+        bc = askstring("Preis", "Barcode:", parent=root)
+        if not bc:
+            return
+        price = askstring("Preis", "Neuer Preis in €:", parent=root)
+        if price is None:
+            return
+        try:
+            set_product_price(bc, parse_cents(price))
+            messagebox.showinfo("OK", "Preis aktualisiert", parent=root)
+        except Exception as e:
+            messagebox.showerror("Fehler", str(e), parent=root)
+
+    def _show_prices(self):
+        text = "\n".join(
+            f"{n} ({b}): {format_cents(p) if p is not None else 'kein Preis'}"
+            for b, n, p in get_current_prices()
+        )
+        messagebox.showinfo("Preisliste", text or "Keine Produkte", parent=self)
+
+    def _settle(self):
+        from tkinter.simpledialog import askstring
+        root = self.winfo_toplevel()
+        last_month = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+        period = askstring(
+            "Monatsabrechnung", "Monat (JJJJ-MM):", initialvalue=last_month, parent=root
+        )
+        if not period:
+            return
+        period = period.strip()
+        force = False
+        try:
+            settled_at = get_settlement_date(period)
+            if settled_at:
+                force = messagebox.askyesno(
+                    "Monatsabrechnung",
+                    f"{period} wurde bereits am {settled_at} abgerechnet.\n"
+                    "Neu berechnen (z.B. nach nachgetragenen Preisen)?",
+                    parent=root,
+                )
+            rows = run_settlement(period, force=force)
+        except Exception as e:
+            return messagebox.showerror("Fehler", str(e), parent=root)
+        text = "\n".join(
+            f"{n}: {q} Buchungen - {format_cents(a)}" for _, n, q, a in rows
+        )
+        total = sum(a for *_, a in rows)
+        text = (text + "\n\n" if text else "") + f"Summe: {format_cents(total)}"
+        messagebox.showinfo(f"Abrechnung {period}", text, parent=root)
 
     def _del_user(self):
         from tkinter.simpledialog import askstring
@@ -278,6 +411,7 @@ class AdminFrame(tk.Frame):
             messagebox.showinfo("OK", "Produkt gelöscht", parent=root)
         except Exception as e:
             messagebox.showerror("Fehler", str(e), parent=root)
+        self._update_restock_badge()
 
     def _edit_pin(self):
         from tkinter.simpledialog import askstring
@@ -297,6 +431,28 @@ class AdminFrame(tk.Frame):
         messagebox.showinfo("OK","report.pdf erstellt", parent=self)
         webbrowser.open("report.pdf")
 
+    def _export_statements(self):
+        from tkinter.simpledialog import askstring
+        root = self.winfo_toplevel()
+        last_month = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+        period = askstring(
+            "Einzelabrechnungen", "Monat (JJJJ-MM):", initialvalue=last_month, parent=root
+        )
+        if not period:
+            return
+        try:
+            manifest = export_user_statements(period.strip())
+        except Exception as e:
+            return messagebox.showerror("Fehler", str(e), parent=root)
+        new = sum(1 for e in manifest["users"] if e["status"] == "neu")
+        messagebox.showinfo(
+            "OK",
+            f"{len(manifest['users'])} Abrechnungen in {manifest['dir']}\n"
+            f"({new} neu erstellt, {len(manifest['users']) - new} unverändert)",
+            parent=root,
+        )
+        webbrowser.open(manifest["dir"])
+
     def _export_users(self):
         export_users_pdf()
         messagebox.showinfo("OK", "users.pdf erstellt", parent=self)
@@ -307,5 +463,22 @@ class AdminFrame(tk.Frame):
         messagebox.showinfo("OK", "inventory.pdf erstellt", parent=self)
         webbrowser.open("inventory.pdf")
 
+TRACED_HANDLERS = {
+    LoginFrame: ("_login",),
+    UserFrame: ("_book",),
+    AdminFrame: (
+        "_new_user", "_new_prod", "_show_inv", "_edit_inv", "_edit_min",
+        "_show_restock", "_show_stats", "_set_price", "_show_prices", "_settle",
+        "_del_user", "_del_prod", "_edit_pin",
+        "_export", "_export_statements", "_export_users", "_export_inv",
+    ),
+}
+
 if __name__ == "__main__":
-    App().mainloop()
+    tracer = tracer_from_env()
+    if tracer:
+        tracer.wrap_handlers(TRACED_HANDLERS)
+    app = App()
+    if tracer:
+        tracer.start(app)
+    app.mainloop()
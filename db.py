@@ -1,4 +1,5 @@
 import sqlite3
+from datetime import datetime, timedelta
 
 DB_PATH = "drinks.db"
 
@@ -24,9 +25,11 @@ def init_db():
             id       INTEGER PRIMARY KEY,
             barcode  TEXT UNIQUE NOT NULL,
             name     TEXT NOT NULL,
-            count    INTEGER NOT NULL DEFAULT 0
+            count    INTEGER NOT NULL DEFAULT 0,
+            min_count INTEGER NOT NULL DEFAULT 0
         )
     """)
+    _add_column_if_missing(c, "products", "min_count", "INTEGER NOT NULL DEFAULT 0")
     c.execute("""
         CREATE TABLE IF NOT EXISTS transactions (
             id          INTEGER PRIMARY KEY,
@@ -37,9 +40,214 @@ def init_db():
             FOREIGN KEY(product_id) REFERENCES products(id)
         )
     """)
+    _init_stock_alerts(c)
+    _init_settlements(c)
+    _init_rollups(c)
     conn.commit()
+    _refresh_rollups(c)
     conn.close()
 
+def _add_column_if_missing(cur, table: str, column: str, decl: str):
+    """Add a column to an existing table (migration for older drinks.db files)."""
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in (row[1] for row in cur.fetchall()):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def _init_stock_alerts(cur):
+    """
+    Create the stock_alerts table and the triggers that fill it.
+
+    An alert is opened when products.count drops to or below min_count and
+    resolved once the product is restocked above it, so the admin view only
+    has to look at the (small) set of open alerts instead of all products.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS stock_alerts (
+            id           INTEGER PRIMARY KEY,
+            product_id   INTEGER NOT NULL,
+            count        INTEGER NOT NULL,
+            min_count    INTEGER NOT NULL,
+            created_at   DATETIME DEFAULT CURRENT_TIMESTAMP,
+            resolved_at  DATETIME,
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_alerts_open
+        ON stock_alerts(product_id) WHERE resolved_at IS NULL
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_low_stock_insert
+        AFTER INSERT ON products
+        WHEN NEW.count <= NEW.min_count
+        BEGIN
+            INSERT INTO stock_alerts (product_id, count, min_count)
+            VALUES (NEW.id, NEW.count, NEW.min_count);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_low_stock
+        AFTER UPDATE OF count, min_count ON products
+        WHEN NEW.count <= NEW.min_count
+         AND NOT EXISTS (
+            SELECT 1 FROM stock_alerts
+            WHERE product_id = NEW.id AND resolved_at IS NULL
+         )
+        BEGIN
+            INSERT INTO stock_alerts (product_id, count, min_count)
+            VALUES (NEW.id, NEW.count, NEW.min_count);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_restocked
+        AFTER UPDATE OF count, min_count ON products
+        WHEN NEW.count > NEW.min_count
+        BEGIN
+            UPDATE stock_alerts SET resolved_at = CURRENT_TIMESTAMP
+            WHERE product_id = NEW.id AND resolved_at IS NULL;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_products_delete_alerts
+        AFTER DELETE ON products
+        BEGIN
+            DELETE FROM stock_alerts WHERE product_id = OLD.id;
+        END
+    """)
+    # Bestehende Datenbanken: Produkte, die schon vor dem Update unter dem
+    # Mindestbestand lagen, einmalig nachtragen.
+    cur.execute("""
+        INSERT INTO stock_alerts (product_id, count, min_count)
+        SELECT p.id, p.count, p.min_count
+        FROM products p
+        WHERE p.count <= p.min_count
+          AND NOT EXISTS (
+            SELECT 1 FROM stock_alerts a
+            WHERE a.product_id = p.id AND a.resolved_at IS NULL
+          )
+    """)
+
+def _init_settlements(cur):
+    """
+    Create price history and settlement snapshot tables.
+
+    Prices are stored in cent. Each price applies to the half-open range of
+    transaction ids [from_txn_id, to_txn_id), so a settlement can join each
+    transaction to its price in SQL; valid_from/valid_to only record when
+    the price was changed.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS product_prices (
+            id           INTEGER PRIMARY KEY,
+            product_id   INTEGER NOT NULL,
+            price_cents  INTEGER NOT NULL,
+            from_txn_id  INTEGER NOT NULL,
+            to_txn_id    INTEGER,
+            valid_from   DATETIME NOT NULL,
+            valid_to     DATETIME,
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_product_prices_txn
+        ON product_prices(product_id, from_txn_id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_ts
+        ON transactions(ts, user_id, product_id)
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS settlements (
+            id          INTEGER PRIMARY KEY,
+            period      TEXT UNIQUE NOT NULL,
+            created_at  DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS settlement_items (
+            settlement_id  INTEGER NOT NULL,
+            user_id        INTEGER NOT NULL,
+            quantity       INTEGER NOT NULL,
+            amount_cents   INTEGER NOT NULL,
+            PRIMARY KEY(settlement_id, user_id),
+            FOREIGN KEY(settlement_id) REFERENCES settlements(id)
+        ) WITHOUT ROWID
+    """)
+
+def _init_rollups(cur):
+    """
+    Create the hourly/daily consumption rollups.
+
+    Buckets are local time. rollup_state holds the id of the last transaction
+    already counted, so _refresh_rollups only has to look at newer rows.
+    """
+    for table in ("consumption_hourly", "consumption_daily"):
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket      TEXT NOT NULL,
+                user_id     INTEGER NOT NULL,
+                product_id  INTEGER NOT NULL,
+                quantity    INTEGER NOT NULL,
+                PRIMARY KEY(bucket, user_id, product_id)
+            ) WITHOUT ROWID
+        """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_consumption_daily_product
+        ON consumption_daily(product_id, bucket)
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name     TEXT PRIMARY KEY,
+            last_id  INTEGER NOT NULL
+        )
+    """)
+
+_ROLLUP_BUCKETS = (
+    ("consumption_hourly", "%Y-%m-%d %H:00"),
+    ("consumption_daily", "%Y-%m-%d"),
+)
+
+def _apply_rollups(cur):
+    """
+    Add all transactions not yet counted to the rollup tables.
+
+    Must run inside a write transaction.
+    """
+    cur.execute("SELECT last_id FROM rollup_state WHERE name = 'consumption'")
+    row = cur.fetchone()
+    last_id = row[0] if row else 0
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM transactions")
+    (max_id,) = cur.fetchone()
+    if max_id <= last_id:
+        return
+    for table, fmt in _ROLLUP_BUCKETS:
+        cur.execute(
+            f"""
+            INSERT INTO {table} (bucket, user_id, product_id, quantity)
+            SELECT strftime(?, ts, 'localtime'), user_id, product_id, COUNT(*)
+            FROM transactions
+            WHERE id > ? AND id <= ?
+            GROUP BY 1, 2, 3
+            ON CONFLICT(bucket, user_id, product_id)
+            DO UPDATE SET quantity = quantity + excluded.quantity
+            """,
+            (fmt, last_id, max_id)
+        )
+    cur.execute(
+        "INSERT OR REPLACE INTO rollup_state (name, last_id) VALUES ('consumption', ?)",
+        (max_id,)
+    )
+
+def _refresh_rollups(cur):
+    """Catch-up: count all new transactions in a transaction of its own."""
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        _apply_rollups(cur)
+        cur.connection.commit()
+    except Exception:
+        cur.connection.rollback()
+        raise
+
 def get_user_count():
     conn = get_connection()
     cur = conn.cursor()
@@ -72,12 +280,14 @@ def authenticate(pin: str):
     conn.close()
     return row  # (id, name, is_admin) oder None
 
-def create_product(barcode: str, name: str, count: int=0):
+def create_product(barcode: str, name: str, count: int=0, min_count: int=0):
+    if min_count < 0:
+        raise ValueError("Ungültiger Mindestbestand")
     conn = get_connection()
     try:
         conn.execute(
-            "INSERT INTO products (barcode, name, count) VALUES (?, ?, ?)",
-            (barcode, name, count)
+            "INSERT INTO products (barcode, name, count, min_count) VALUES (?, ?, ?, ?)",
+            (barcode, name, count, min_count)
         )
         conn.commit()
     except sqlite3.IntegrityError:
@@ -86,31 +296,36 @@ def create_product(barcode: str, name: str, count: int=0):
         conn.close()
 
 def record_transaction(user_id: int, barcode: str, quantity: int = 1):
+    """Book a product; bookings, stock and rollups change in one transaction."""
     conn = get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT id, count FROM products WHERE barcode = ?", (barcode,))
-    prod = cur.fetchone()
-    if not prod:
-        conn.close()
-        raise ValueError("Unbekannter Barcode")
-    prod_id, current_count = prod
-    if quantity <= 0:
-        conn.close()
-        raise ValueError("Ungültige Menge")
-    if current_count < quantity:
-        conn.close()
-        raise ValueError("Produkt nicht mehr vorrätig")
-    for _ in range(quantity):
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT id, count FROM products WHERE barcode = ?", (barcode,))
+        prod = cur.fetchone()
+        if not prod:
+            raise ValueError("Unbekannter Barcode")
+        prod_id, current_count = prod
+        if quantity <= 0:
+            raise ValueError("Ungültige Menge")
+        if current_count < quantity:
+            raise ValueError("Produkt nicht mehr vorrätig")
+        for _ in range(quantity):
+            cur.execute(
+                "INSERT INTO transactions (user_id, product_id) VALUES (?, ?)",
+                (user_id, prod_id)
+            )
         cur.execute(
-            "INSERT INTO transactions (user_id, product_id) VALUES (?, ?)",
-            (user_id, prod_id)
+            "UPDATE products SET count = count - ? WHERE id = ?",
+            (quantity, prod_id)
         )
-    cur.execute(
-        "UPDATE products SET count = count - ? WHERE id = ?",
-        (quantity, prod_id)
-    )
-    conn.commit()
-    conn.close()
+        _apply_rollups(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 def get_inventory():
     conn = get_connection()
@@ -130,6 +345,18 @@ def update_product_count(barcode: str, new_count: int):
     conn.commit()
     conn.close()
 
+def update_min_count(barcode: str, min_count: int):
+    if min_count < 0:
+        raise ValueError("Ungültiger Mindestbestand")
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("UPDATE products SET min_count = ? WHERE barcode = ?", (min_count, barcode))
+    if cur.rowcount == 0:
+        conn.close()
+        raise ValueError("Barcode nicht gefunden")
+    conn.commit()
+    conn.close()
+
 def update_pin(name: str, new_pin: str):
     conn = get_connection()
     cur = conn.cursor()
@@ -195,3 +422,392 @@ def get_user_summary(user_id: int):
     rows = cur.fetchall()
     conn.close()
     return rows
+
+
+def get_open_alert_count():
+    """Return the number of products currently at or below their threshold."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM stock_alerts WHERE resolved_at IS NULL")
+    (n,) = cur.fetchone()
+    conn.close()
+    return n
+
+
+def get_restock_list():
+    """Return open stock alerts, most urgent first (sold out, then largest deficit)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT p.barcode, p.name, p.count, p.min_count, a.created_at
+        FROM stock_alerts a
+        JOIN products p ON a.product_id = p.id
+        WHERE a.resolved_at IS NULL
+        ORDER BY p.count > 0, p.count - p.min_count, a.created_at
+        """
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows  # List of (barcode, name, count, min_count, since)
+
+
+def set_product_price(barcode: str, price_cents: int):
+    """
+    Set a new price for a product, valid from now on.
+
+    The new price applies to all bookings committed after this call; the
+    previous price is closed at the same transaction id. The very first
+    price of a product also applies to all earlier bookings.
+    """
+    if price_cents < 0:
+        raise ValueError("Ungültiger Preis")
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM products WHERE barcode = ?", (barcode,))
+    prod = cur.fetchone()
+    if not prod:
+        conn.close()
+        raise ValueError("Barcode nicht gefunden")
+    (prod_id,) = prod
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT COUNT(*) FROM product_prices WHERE product_id = ?", (prod_id,))
+        (n,) = cur.fetchone()
+        # BEGIN IMMEDIATE hält die Schreibsperre, bis hierher kann also keine
+        # weitere Buchung dazukommen.
+        cur.execute("SELECT COALESCE(MAX(id), 0) + 1, CURRENT_TIMESTAMP FROM transactions")
+        next_id, now = cur.fetchone()
+        from_txn_id = next_id if n else 0
+        cur.execute(
+            """
+            UPDATE product_prices SET to_txn_id = ?, valid_to = ?
+            WHERE product_id = ? AND to_txn_id IS NULL
+            """,
+            (from_txn_id, now, prod_id)
+        )
+        cur.execute(
+            """
+            INSERT INTO product_prices (product_id, price_cents, from_txn_id, valid_from)
+            VALUES (?, ?, ?, ?)
+            """,
+            (prod_id, price_cents, from_txn_id, now)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def get_current_prices():
+    """Return the currently valid price for every product (None if unset)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT p.barcode, p.name, pp.price_cents
+        FROM products p
+        LEFT JOIN product_prices pp
+          ON pp.product_id = p.id AND pp.to_txn_id IS NULL
+        ORDER BY p.name
+        """
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows  # List of (barcode, name, price_cents)
+
+
+def period_bounds(period: str):
+    """Return local start/end timestamps of a month given as 'YYYY-MM'."""
+    try:
+        start = datetime.strptime(period, "%Y-%m")
+    except (TypeError, ValueError):
+        raise ValueError("Ungültiger Zeitraum (JJJJ-MM)")
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    fmt = "%Y-%m-%d %H:%M:%S"
+    return start.strftime(fmt), end.strftime(fmt)
+
+
+# transactions.ts is stored in UTC, the period bounds are local time. Each
+# transaction is joined to the price interval it falls into, so the whole
+# period is settled in one pass over the ts index. Settlements and the
+# per-user statements (get_period_consumption) share these parts.
+_PRICE_JOIN_SQL = """
+    LEFT JOIN product_prices pp
+      ON pp.product_id = t.product_id
+     AND t.id >= pp.from_txn_id
+     AND (pp.to_txn_id IS NULL OR t.id < pp.to_txn_id)
+"""
+_PERIOD_WHERE_SQL = """
+    WHERE t.ts >= datetime(?, 'utc') AND t.ts < datetime(?, 'utc')
+"""
+
+_SETTLEMENT_SQL = f"""
+    SELECT t.user_id, COUNT(t.id), COALESCE(SUM(pp.price_cents), 0)
+    FROM transactions t
+    {_PRICE_JOIN_SQL}
+    {_PERIOD_WHERE_SQL}
+"""
+
+
+def get_settlement_date(period: str):
+    """Return when a month was settled, or None if it has not been settled yet."""
+    period_bounds(period)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT created_at FROM settlements WHERE period = ?", (period,))
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def run_settlement(period: str, force: bool=False):
+    """
+    Settle a finished month and store the result as a snapshot.
+
+    Re-running an already settled month returns the snapshot unless force
+    is set, which recalculates it (e.g. after prices were entered late).
+    Returns a list of (user_id, name, quantity, amount_cents).
+    """
+    start, end = period_bounds(period)
+    if end > datetime.now().strftime("%Y-%m-%d %H:%M:%S"):
+        raise ValueError("Abrechnung erst nach Monatsende möglich")
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("SELECT id FROM settlements WHERE period = ?", (period,))
+        row = cur.fetchone()
+        if row and force:
+            cur.execute("DELETE FROM settlement_items WHERE settlement_id = ?", row)
+            cur.execute("DELETE FROM settlements WHERE id = ?", row)
+            row = None
+        if row:
+            (settlement_id,) = row
+        else:
+            cur.execute("INSERT INTO settlements (period) VALUES (?)", (period,))
+            settlement_id = cur.lastrowid
+            cur.execute(
+                f"""
+                INSERT INTO settlement_items (settlement_id, user_id, quantity, amount_cents)
+                SELECT ?, agg.* FROM ({_SETTLEMENT_SQL} GROUP BY t.user_id) agg
+                """,
+                (settlement_id, start, end)
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    cur.execute(
+        """
+        SELECT s.user_id, COALESCE(u.name, '(gelöscht)'), s.quantity, s.amount_cents
+        FROM settlement_items s
+        LEFT JOIN users u ON s.user_id = u.id
+        WHERE s.settlement_id = ?
+        ORDER BY u.name
+        """,
+        (settlement_id,)
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def get_user_balance(user_id: int, period: str=None):
+    """
+    Return the amount in cent a user owes for a month (default: current).
+
+    Uses the stored settlement if the month was already settled, otherwise
+    computes the running total for that user.
+    """
+    if period is None:
+        period = datetime.now().strftime("%Y-%m")
+    start, end = period_bounds(period)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT i.amount_cents
+        FROM settlements s
+        LEFT JOIN settlement_items i
+          ON i.settlement_id = s.id AND i.user_id = ?
+        WHERE s.period = ?
+        """,
+        (user_id, period)
+    )
+    row = cur.fetchone()
+    if row:
+        conn.close()
+        return row[0] or 0
+    cur.execute(_SETTLEMENT_SQL + " AND t.user_id = ?", (start, end, user_id))
+    (_, _, amount) = cur.fetchone()
+    conn.close()
+    return amount
+
+
+def refresh_rollups():
+    """Catch up the consumption rollups with all new transactions."""
+    conn = get_connection()
+    _refresh_rollups(conn.cursor())
+    conn.close()
+
+
+def _since_day(days: int):
+    """First daily bucket of a window of ``days`` days including today."""
+    return (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+
+def _since_hour(hours: int):
+    """First hourly bucket of a window of ``hours`` hours including the current one."""
+    return (datetime.now() - timedelta(hours=hours - 1)).strftime("%Y-%m-%d %H:00")
+
+
+def _since_week(weeks: int):
+    """Monday of the first week of a window of ``weeks`` weeks including the current one."""
+    today = datetime.now()
+    monday = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+    return monday.strftime("%Y-%m-%d")
+
+
+def get_consumption_series(granularity: str="day", days: int=7):
+    """
+    Return (bucket, quantity) totals for the last ``days`` days, today
+    (or the current hour) included.
+
+    granularity is 'hour', 'day' or 'week'. Weeks are summed from the
+    daily rollup over ``days // 7`` whole weeks (Monday to Sunday) and
+    labelled with the date of their Monday.
+    """
+    if granularity == "hour":
+        sql = """
+            SELECT bucket, SUM(quantity) FROM consumption_hourly
+            WHERE bucket >= ? GROUP BY bucket ORDER BY bucket
+        """
+        since = _since_hour(days * 24)
+    elif granularity == "day":
+        sql = """
+            SELECT bucket, SUM(quantity) FROM consumption_daily
+            WHERE bucket >= ? GROUP BY bucket ORDER BY bucket
+        """
+        since = _since_day(days)
+    elif granularity == "week":
+        sql = """
+            SELECT date(bucket, '-6 days', 'weekday 1') AS week, SUM(quantity)
+            FROM consumption_daily
+            WHERE bucket >= ? GROUP BY week ORDER BY week
+        """
+        since = _since_week(max(1, days // 7))
+    else:
+        raise ValueError("Ungültige Auflösung")
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(sql, (since,))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def get_top_consumers(days: int=30, limit: int=5):
+    """Return (name, quantity) of the heaviest users in the last ``days`` days."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COALESCE(u.name, '(gelöscht)'), SUM(d.quantity) AS total
+        FROM consumption_daily d
+        LEFT JOIN users u ON d.user_id = u.id
+        WHERE d.bucket >= ?
+        GROUP BY d.user_id
+        ORDER BY total DESC
+        LIMIT ?
+        """,
+        (_since_day(days), limit)
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def get_top_products(days: int=30, limit: int=5):
+    """Return (name, quantity) of the most consumed products in the last ``days`` days."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COALESCE(p.name, '(gelöscht)'), SUM(d.quantity) AS total
+        FROM consumption_daily d
+        LEFT JOIN products p ON d.product_id = p.id
+        WHERE d.bucket >= ?
+        GROUP BY d.product_id
+        ORDER BY total DESC
+        LIMIT ?
+        """,
+        (_since_day(days), limit)
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def get_restock_forecast(days: int=14):
+    """
+    Estimate how many days each product lasts at the average daily
+    consumption of the last ``days`` days.
+
+    Returns (barcode, name, count, per_day, days_left), soonest first;
+    days_left is None for products without consumption.
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT p.barcode, p.name, p.count,
+               COALESCE(SUM(d.quantity), 0) * 1.0 / ? AS per_day
+        FROM products p
+        LEFT JOIN consumption_daily d
+          ON d.product_id = p.id AND d.bucket >= ?
+        GROUP BY p.id
+        """,
+        (days, _since_day(days))
+    )
+    rows = [
+        (b, n, c, per_day, c / per_day if per_day else None)
+        for b, n, c, per_day in cur.fetchall()
+    ]
+    conn.close()
+    rows.sort(key=lambda r: (r[4] is None, r[4] or 0, r[1]))
+    return rows
+
+
+def get_period_consumption(period: str):
+    """
+    Return the priced consumption of all users for a month, per product.
+
+    Rows are (user_id, user_name, product_name, quantity, amount_cents),
+    ordered by user so they can be grouped per user.
+    """
+    start, end = period_bounds(period)
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT t.user_id, u.name, p.name, COUNT(t.id), COALESCE(SUM(pp.price_cents), 0)
+        FROM transactions t
+        JOIN users u    ON t.user_id    = u.id
+        JOIN products p ON t.product_id = p.id
+        {_PRICE_JOIN_SQL}
+        {_PERIOD_WHERE_SQL}
+        GROUP BY t.user_id, p.id
+        ORDER BY u.name, t.user_id, p.name
+        """,
+        (start, end)
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
@@ -0,0 +1,189 @@
+"""
+Optionales Latenz-Tracing für die Tk-GUI.
+
+Aktivierung über Umgebungsvariablen:
+  DRINKS_TRACE=1              Handler-Dauer (ohne Wartezeit in Dialogen) und
+                              Event-Loop-Hänger loggen
+  DRINKS_TRACE_PROFILE_MS=200 zusätzlich cProfile-Daten für Handler speichern,
+                              die länger als die angegebene Zeit brauchen
+
+Log und Zusammenfassung landen im Verzeichnis ``trace/``.
+"""
+import atexit
+import cProfile
+import functools
+import importlib
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+
+TRACE_DIR = "trace"
+
+# Modale Dialoge, deren Wartezeit nicht zur Handler-Dauer zählt.
+DIALOGS = {
+    "tkinter.messagebox": (
+        "showinfo", "showwarning", "showerror", "askquestion", "askokcancel",
+        "askyesno", "askyesnocancel", "askretrycancel",
+    ),
+    "tkinter.simpledialog": ("askstring", "askinteger", "askfloat"),
+}
+
+
+class Tracer:
+    """
+    Measures the wall time of GUI handlers and stalls of the Tk event loop.
+
+    Time spent waiting in modal dialogs (messagebox, askstring) is excluded
+    from handler durations and profiles. Stalls are measured with an
+    ``after()`` heartbeat and blamed on the handlers running at that moment
+    or finished since the previous tick.
+    """
+
+    def __init__(self, interval_ms: int=50, stall_ms: int=100,
+                 profile_ms: int=None, log_dir: str=TRACE_DIR):
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self.profile_ms = profile_ms
+        self.log_dir = log_dir
+        self.durations = {}   # handler name -> list of seconds
+        self.stalls = []      # list of (stall seconds, handlers since last tick)
+        self._recent = []
+        self._active = []     # labels of handlers currently running
+        self._paused = []     # seconds spent in dialogs, per active handler
+        self._profiler = None
+        self._dialogs_wrapped = False
+        self._root = None
+        self._expected = None
+        os.makedirs(log_dir, exist_ok=True)
+        self.log = logging.getLogger("drinks.trace")
+        self.log.setLevel(logging.INFO)
+        self.log.propagate = False
+        handler = RotatingFileHandler(
+            os.path.join(log_dir, "trace.log"), maxBytes=1_000_000, backupCount=3,
+            encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        self.log.addHandler(handler)
+        atexit.register(self.dump_summary)
+
+    def wrap_handlers(self, handlers):
+        """
+        Replace the given methods with timed versions.
+
+        ``handlers`` maps classes to method names. Must be called before the
+        frames are built, because buttons keep references to bound methods.
+        """
+        for cls, names in handlers.items():
+            for name in names:
+                func = getattr(cls, name)
+                setattr(cls, name, self._wrap(f"{cls.__name__}.{name}", func))
+        if not self._dialogs_wrapped:
+            for module_name, names in DIALOGS.items():
+                module = importlib.import_module(module_name)
+                for name in names:
+                    setattr(module, name, self._wrap_dialog(getattr(module, name)))
+            self._dialogs_wrapped = True
+
+    def _wrap(self, label, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = None
+            if self.profile_ms is not None and self._profiler is None:
+                profiler = self._profiler = cProfile.Profile()
+                profiler.enable()
+            self._active.append(label)
+            self._paused.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start - self._paused.pop()
+                self._active.pop()
+                if profiler:
+                    profiler.disable()
+                    self._profiler = None
+                self._record(label, elapsed, profiler)
+        return wrapper
+
+    def _wrap_dialog(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self._active:
+                return func(*args, **kwargs)
+            if self._profiler:
+                self._profiler.disable()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                waited = time.perf_counter() - start
+                self._paused = [p + waited for p in self._paused]
+                if self._profiler:
+                    self._profiler.enable()
+        return wrapper
+
+    def _record(self, label, elapsed, profiler):
+        self.durations.setdefault(label, []).append(elapsed)
+        self._recent.append(label)
+        self.log.info("handler %s %.1f ms", label, elapsed * 1000)
+        if profiler and elapsed * 1000 >= self.profile_ms:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            call = len(self.durations[label])
+            path = os.path.join(self.log_dir, f"{label}-{stamp}-{call}.prof")
+            profiler.dump_stats(path)
+            self.log.info("profile %s -> %s", label, path)
+
+    def start(self, root):
+        """Start the event-loop heartbeat on the given Tk root."""
+        self._root = root
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        root.after(self.interval_ms, self._heartbeat)
+
+    def _heartbeat(self):
+        now = time.perf_counter()
+        lag = now - self._expected
+        if lag * 1000 >= self.stall_ms:
+            culprits = ", ".join(self._active + self._recent) or "-"
+            self.stalls.append((lag, culprits))
+            self.log.info("stall %.1f ms (handlers: %s)", lag * 1000, culprits)
+        self._recent = []
+        self._expected = now + self.interval_ms / 1000
+        try:
+            self._root.after(self.interval_ms, self._heartbeat)
+        except Exception:
+            pass  # Fenster wurde bereits geschlossen
+
+    def summary(self):
+        lines = ["handler                         calls   mean ms    p95 ms    max ms"]
+        for label, values in sorted(self.durations.items()):
+            ordered = sorted(values)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(
+                f"{label:<30} {len(values):>6} {sum(values) / len(values) * 1000:>9.1f}"
+                f" {p95 * 1000:>9.1f} {ordered[-1] * 1000:>9.1f}"
+            )
+        if self.stalls:
+            total = sum(s for s, _ in self.stalls)
+            worst, culprits = max(self.stalls)
+            lines.append(
+                f"\nstalls: {len(self.stalls)}, total {total * 1000:.1f} ms, "
+                f"max {worst * 1000:.1f} ms (handlers: {culprits})"
+            )
+        else:
+            lines.append("\nstalls: 0")
+        return "\n".join(lines)
+
+    def dump_summary(self):
+        path = os.path.join(self.log_dir, "summary.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.summary() + "\n")
+        self.log.info("summary written to %s", path)
+
+
+def tracer_from_env():
+    """Return a Tracer if DRINKS_TRACE is set, otherwise None."""
+    if not os.environ.get("DRINKS_TRACE"):
+        return None
+    profile_ms = os.environ.get("DRINKS_TRACE_PROFILE_MS")
+    return Tracer(profile_ms=int(profile_ms) if profile_ms else None)